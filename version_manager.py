@@ -1,12 +1,9 @@
-import subprocess
+import functools
+import os
 import re
 import sys
-from datetime import datetime
 from pathlib import Path
-from colorama import Fore, Style, init
-import argparse
-
-init(autoreset=True)
+from types import SimpleNamespace
 
 VERSION_FILE = Path("VERSION")
 CHANGELOG_FILE = Path("CHANGELOG.md")
@@ -15,6 +12,7 @@ VERSIONED_FILES = [
     Path("setup.py"),  # Common for Python packages
     Path("src/__init__.py"), # Example for an internal file
 ]
+BUMP_TYPES = ("patch", "minor", "major")
 # Define valid changelog categories and their emojis/headers
 CHANGELOG_CATEGORIES = {
     "feature": "✨ Added",
@@ -23,33 +21,88 @@ CHANGELOG_CATEGORIES = {
     "chore": "🧹 Chore",
     "docs": "📝 Docs",
 }
+# Validates and splits a plain MAJOR.MINOR.PATCH version in one pass
+_SEMVER_RE = re.compile(r"\A(\d+)\.(\d+)\.(\d+)\Z")
+# Matches version='X.Y.Z' or __version__ = 'X.Y.Z'; callers filter on the captured version
+_VERSION_ASSIGN_RE = re.compile(
+    rb"(?P<prefix>(?<!\w)(?:__version__|version)\s*=\s*)(?P<q>['\"])(?P<ver>\d+\.\d+\.\d+)(?P=q)"
+)
+# The changelog's top-level heading line; the file's first block is searched in one go
+_CHANGELOG_HEADING_RE = re.compile(rb"^# Changelog[^\n]*(?:\n|\Z)", re.MULTILINE)
+_CHANGELOG_HEAD_SIZE = 4096
+# Peels one matching pair of surrounding quotes (single, double or triple) off a message
+_QUOTE_STRIP_RE = re.compile(r"^\s*(?P<q>\"{3}|'{3}|\"|')?(?P<body>.*?)(?(q)(?P=q)|)\s*\Z", re.DOTALL)
 
 
 # -------------------------------
 # Utilities
 # -------------------------------
 
-def get_current_version():
-    """Read current version or create default."""
-    if not VERSION_FILE.exists():
-        VERSION_FILE.write_text("0.0.0", encoding="utf-8")
-        print(Fore.YELLOW + "🪄 VERSION file not found — created default 0.0.0")
+class _NoColor:
+    """Stand-in for colorama's Fore/Style when stdout is not a terminal."""
+
+    def __getattr__(self, name):
+        return ""
+
+
+_colors_cache = None
+
+# Fore attribute names for say(), resolved lazily so colorama stays unimported
+_OK = "GREEN"
+_WARN = "YELLOW"
+_ERR = "RED"
+_INFO = "CYAN"
+_DRY = "MAGENTA"
 
+
+def _colors():
+    """Return (Fore, Style), loading colorama on first use when stdout is a TTY."""
+    global _colors_cache
+    if _colors_cache is None:
+        if sys.stdout.isatty():
+            from colorama import Fore, Style, init
+            init(autoreset=True)
+            _colors_cache = (Fore, Style)
+        else:
+            _colors_cache = (_NoColor(), _NoColor())
+    return _colors_cache
+
+
+def say(color, msg, bright=False):
+    """Write one colored status line in a single stdout write."""
+    Fore, Style = _colors()
+    prefix = getattr(Fore, color)
+    if bright:
+        prefix = Style.BRIGHT + prefix
+    sys.stdout.write(f"{prefix}{msg}{Style.RESET_ALL}\n")
+
+
+@functools.lru_cache(maxsize=1)
+def get_current_version():
+    """Read current version or create default (cached until invalidated)."""
     try:
-        version = VERSION_FILE.read_text(encoding="utf-8").strip()
-        parts = version.split(".")
-        if len(parts) != 3 or not all(p.isdigit() for p in parts):
+        match = _SEMVER_RE.match(VERSION_FILE.read_text(encoding="utf-8").strip())
+        if not match:
             raise ValueError
-        return version
+        return match[0]
+    except FileNotFoundError:
+        VERSION_FILE.write_text("0.0.0", encoding="utf-8")
+        say(_WARN, "🪄 VERSION file not found — created default 0.0.0")
+        return "0.0.0"
     except Exception:
-        print(Fore.RED + "⚠️ Invalid VERSION format — resetting to 0.0.0")
+        say(_ERR, "⚠️ Invalid VERSION format — resetting to 0.0.0")
         VERSION_FILE.write_text("0.0.0", encoding="utf-8")
         return "0.0.0"
 
 
+def invalidate_current_version():
+    """Drop the cached VERSION value after the file is rewritten."""
+    get_current_version.cache_clear()
+
+
 def bump_version(current_version, bump_type):
     """Increment version based on bump type."""
-    major, minor, patch = map(int, current_version.split("."))
+    major, minor, patch = map(int, _SEMVER_RE.match(current_version).groups())
 
     if bump_type == "major":
         major += 1
@@ -62,14 +115,17 @@ def bump_version(current_version, bump_type):
         patch += 1
 
     new_version = f"{major}.{minor}.{patch}"
-    print(f"{Fore.CYAN}🔧 Bumping version {current_version} → {new_version}")
+    say(_INFO, f"🔧 Bumping version {current_version} → {new_version}")
     return new_version
 
 
-def build_changelog_entry(new_version, message, category="feature"):
+def build_changelog_entry(new_version, message, category="feature", date_str=None):
     """Build changelog text for display or write with categorization."""
-    date_str = datetime.now().strftime("%Y-%m-%d")
-    header = CHANGELOG_CATEGORIES.get(category.lower(), "✨ Added")
+    if date_str is None:
+        from datetime import datetime
+
+        date_str = datetime.now().strftime("%Y-%m-%d")
+    header = CHANGELOG_CATEGORIES[category]
 
     # Format message for list or blockquote if multi-line
     if "\n" in message:
@@ -80,74 +136,179 @@ def build_changelog_entry(new_version, message, category="feature"):
     return f"## [{new_version}] - {date_str}\n### {header}\n{entry_content}\n\n"
 
 
+@functools.lru_cache(maxsize=32)
+def _read_versioned(path_str, mtime_ns, size, old_version):
+    """Return a versioned file's bytes and old-version spans (cached by mtime and size)."""
+    content = Path(path_str).read_bytes()
+    old_bytes = old_version.encode()
+    # Cheap substring scans first: the regex only matches the version inside quotes,
+    # so files where it appears bare (or inside e.g. "11.3.0") never reach the regex
+    if b'"' + old_bytes + b'"' not in content and b"'" + old_bytes + b"'" not in content:
+        return content, ()
+    spans = tuple(m.span("ver") for m in _VERSION_ASSIGN_RE.finditer(content) if m["ver"] == old_bytes)
+    return content, spans
+
+
 def update_version_in_files(old_version, new_version, dry_run=False):
     """Update version string in secondary files (e.g., setup.py)."""
     updated_files = []
-    # Regex to find version strings like version='X.Y.Z' or __version__ = 'X.Y.Z'
-    pattern = re.compile(r"version\s*=\s*['\"]" + re.escape(old_version) + r"['\"]|__version__\s*=\s*['\"]" + re.escape(old_version) + r"['\"]")
-    replacement = r"\g<0>".replace(old_version, new_version) # Preserve quotes/spacing
+    new_bytes = new_version.encode()
 
     for file_path in VERSIONED_FILES:
-        if file_path.exists():
-            try:
-                content = file_path.read_text(encoding="utf-8")
-                new_content, count = re.subn(pattern, replacement, content)
-
-                if count > 0:
-                    if not dry_run:
-                        file_path.write_text(new_content, encoding="utf-8")
-                        updated_files.append(str(file_path))
-                        print(Fore.GREEN + f"  → Updated version in {file_path}")
-                    else:
-                        print(Fore.MAGENTA + f"  → Would update version in {file_path}")
-                
-            except Exception as e:
-                print(Fore.RED + f"⚠️ Failed to process {file_path}: {e}")
+        try:
+            stat = file_path.stat()
+            content, spans = _read_versioned(str(file_path), stat.st_mtime_ns, stat.st_size, old_version)
+            if not spans:
+                continue
+
+            if dry_run:
+                say(_DRY, f"  → Would update version in {file_path}")
+                continue
+
+            # Splice the new version into the cached spans; quotes/spacing are untouched
+            pieces = []
+            last = 0
+            for start, end in spans:
+                pieces += (content[last:start], new_bytes)
+                last = end
+            pieces.append(content[last:])
+            file_path.write_bytes(b"".join(pieces))
+            updated_files.append(str(file_path))
+            say(_OK, f"  → Updated version in {file_path}")
+
+        except FileNotFoundError:
+            continue
+        except Exception as e:
+            say(_ERR, f"⚠️ Failed to process {file_path}: {e}")
 
     return updated_files
 
 
-def update_files(new_version, message, category, dry_run=False):
+def _atomic_write_all(writers):
+    """Write each (path, write) pair to a synced temp file, then rename them all into place."""
+    import shutil
+    import tempfile
+
+    pending = []
+    try:
+        for path, write in writers:
+            with tempfile.NamedTemporaryFile("wb", delete=False, dir=path.parent) as tmp:
+                pending.append((tmp.name, path))
+                write(tmp)
+                tmp.flush()
+                os.fsync(tmp.fileno())
+            try:
+                shutil.copymode(path, tmp.name)
+            except FileNotFoundError:
+                # New file: use the usual default mode, not the temp file's private 0600
+                umask = os.umask(0)
+                os.umask(umask)
+                os.chmod(tmp.name, 0o666 & ~umask)
+
+        for tmp_name, path in pending:
+            os.replace(tmp_name, path)
+    except BaseException:
+        for tmp_name, _ in pending:
+            Path(tmp_name).unlink(missing_ok=True)
+        raise
+
+
+def _fsync_dir(path):
+    """Flush renames in *path*'s directory to disk (no-op where unsupported)."""
+    if not hasattr(os, "O_DIRECTORY"):
+        return
+    fd = os.open(path.parent, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _find_changelog_heading(src):
+    """Return the byte offset just past the changelog heading line in *src*, or None."""
+    head = src.read(_CHANGELOG_HEAD_SIZE)
+    if len(head) == _CHANGELOG_HEAD_SIZE:
+        # Finish the last line so a heading is never split at the buffer edge
+        head += src.readline()
+    match = _CHANGELOG_HEADING_RE.search(head)
+    if match:
+        return match.end()
+
+    # Heading below a long intro (or missing): keep scanning line by line
+    offset = len(head)
+    for line in src:
+        if _CHANGELOG_HEADING_RE.match(line):
+            return offset + len(line)
+        offset += len(line)
+    return None
+
+
+def prepend_changelog_entry(changelog_entry, out):
+    """Write the changelog with the new entry under its heading to the binary file *out*."""
+    import shutil
+
+    entry = changelog_entry.rstrip().encode("utf-8") + b"\n"
+    try:
+        with CHANGELOG_FILE.open("rb") as src:
+            heading_end = _find_changelog_heading(src)
+            src.seek(0)
+            if heading_end is None:
+                out.write(b"# Changelog\n")
+            else:
+                # Copy everything up to and including the heading line unchanged
+                remaining = heading_end
+                while remaining:
+                    chunk = src.read(min(remaining, 64 * 1024))
+                    out.write(chunk)
+                    remaining -= len(chunk)
+                if not chunk.endswith(b"\n"):
+                    out.write(b"\n")
+            out.write(entry)
+
+            # Drop blank lines between the heading and the first old entry
+            rest = src.read(64 * 1024)
+            while rest and not rest.strip(b"\r\n"):
+                rest = src.read(64 * 1024)
+            rest = rest.lstrip(b"\r\n")
+            if rest:
+                out.write(b"\n" + rest)
+                shutil.copyfileobj(src, out, 64 * 1024)
+    except FileNotFoundError:
+        out.write(b"# Changelog\n" + entry)
+        say(_WARN, "🪄 CHANGELOG.md not found — created fresh one")
+
+
+def update_files(old_version, new_version, message, category, release_date, dry_run=False):
     """Safely update version and changelog with UTF-8 encoding."""
-    changelog_entry = build_changelog_entry(new_version, message, category)
+    changelog_entry = build_changelog_entry(new_version, message, category, date_str=release_date)
     files_to_add = ["VERSION", "CHANGELOG.md"]
 
     if dry_run:
-        print(Style.BRIGHT + Fore.MAGENTA + "\n🚀 Dry Run Preview (no files written):\n")
-        print(Fore.CYAN + f"📦 VERSION would become:\n{new_version}\n")
-        print(Fore.CYAN + "📝 CHANGELOG entry would be:\n" + Fore.RESET + changelog_entry)
-        update_version_in_files(get_current_version(), new_version, dry_run=True) # Run secondary file update in dry-run
-        print(Fore.GREEN + "✅ Nothing written. Use without --dry-run to apply changes.\n")
+        Fore, Style = _colors()
+        sys.stdout.write(
+            f"{Style.BRIGHT}{Fore.MAGENTA}\n🚀 Dry Run Preview (no files written):\n\n{Style.RESET_ALL}"
+            f"{Fore.CYAN}📦 VERSION would become:\n{new_version}\n\n"
+            f"{Fore.CYAN}📝 CHANGELOG entry would be:\n{Fore.RESET}{changelog_entry}\n"
+        )
+        update_version_in_files(old_version, new_version, dry_run=True) # Run secondary file update in dry-run
+        say(_OK, "✅ Nothing written. Use without --dry-run to apply changes.\n")
         return
 
     # --- Actual file write flow ---
-    VERSION_FILE.write_text(new_version.strip(), encoding="utf-8")
-
-    # Read or create changelog (logic simplified for brevity, kept original insert method)
-    if CHANGELOG_FILE.exists():
-        content = CHANGELOG_FILE.read_text(encoding="utf-8").strip()
-    else:
-        content = "# Changelog\n\n"
-        print(Fore.YELLOW + "🪄 CHANGELOG.md not found — created fresh one")
-
-    if not content.startswith("# Changelog"):
-        content = "# Changelog\n\n" + content
-    
-    # Attempt to insert new entry right after the main heading
-    try:
-        insert_index = content.find('\n', content.find('# Changelog') + len('# Changelog'))
-        new_content = content[:insert_index] + "\n" + changelog_entry + content[insert_index:].strip()
-    except Exception:
-        new_content = content + "\n" + changelog_entry
-        print(Fore.YELLOW + "⚠️ Failed to insert at top, appending to end.")
-
-    CHANGELOG_FILE.write_text(new_content.strip() + "\n", encoding="utf-8")
+    # Both files are written and synced before either is renamed, so a failure while
+    # writing leaves them untouched; only the final back-to-back renames can split them
+    _atomic_write_all([
+        (VERSION_FILE, lambda out: out.write(new_version.strip().encode("utf-8"))),
+        (CHANGELOG_FILE, lambda out: prepend_changelog_entry(changelog_entry, out)),
+    ])
+    _fsync_dir(CHANGELOG_FILE)
+    invalidate_current_version()
 
     # Update secondary files and track them for git add
-    updated_secondary_files = update_version_in_files(get_current_version(), new_version, dry_run=False)
+    updated_secondary_files = update_version_in_files(old_version, new_version, dry_run=False)
     files_to_add.extend(updated_secondary_files)
     
-    print(Fore.GREEN + f"✅ Updated VERSION and CHANGELOG.md → v{new_version}")
+    say(_OK, f"✅ Updated VERSION and CHANGELOG.md → v{new_version}")
 
     return files_to_add
 
@@ -157,49 +318,90 @@ def update_files(new_version, message, category, dry_run=False):
 # -------------------------------
 
 def is_working_dir_clean():
-    """Check if the git working directory is clean."""
+    """Check if tracked files have no staged or unstaged changes against HEAD."""
+    import subprocess
+
     try:
-        result = subprocess.run(["git", "status", "--porcelain"], capture_output=True, text=True, check=True)
-        return not result.stdout.strip()
-    except subprocess.CalledProcessError:
-        print(Fore.RED + "⚠️ Git command failed. Is this a Git repository?")
-        sys.exit(1)
+        # Exit code only: 0 = clean, 1 = changes, anything else = git error
+        returncode = subprocess.run(["git", "diff", "--quiet", "HEAD", "--"], stderr=subprocess.DEVNULL).returncode
+        if returncode not in (0, 1):
+            say(_ERR, "⚠️ Git command failed. Is this a Git repository with at least one commit?")
+            sys.exit(1)
+        return returncode == 0
     except FileNotFoundError:
-        print(Fore.RED + "⚠️ Git not found. Is it installed and in PATH?")
+        say(_ERR, "⚠️ Git not found. Is it installed and in PATH?")
         sys.exit(1)
 
 
 def git_commit_and_tag(new_version, message, files_to_add, dry_run=False):
     """Commit, tag, and push new version in git."""
+    import subprocess
+
     if dry_run:
-        print(Fore.MAGENTA + "💡 Skipping git commit, tag, and push (dry-run mode)\n")
+        say(_DRY, "💡 Skipping git commit, tag, and push (dry-run mode)\n")
         return
     try:
         # Commit
         subprocess.run(["git", "add"] + files_to_add, check=True)
         subprocess.run(["git", "commit", "-m", f"Release: {message} (v{new_version})"], check=True)
-        print(Fore.GREEN + f"✅ Git commit created for v{new_version}")
+        say(_OK, f"✅ Git commit created for v{new_version}")
 
-        # Tag
-        subprocess.run(["git", "tag", f"v{new_version}"], check=True)
-        print(Fore.GREEN + f"✅ Git tag created for v{new_version}")
+        # Tag (annotated, so --follow-tags below pushes it with the commit)
+        subprocess.run(["git", "tag", "-a", f"v{new_version}", "-m", f"Release v{new_version}"], check=True)
+        say(_OK, f"✅ Git tag created for v{new_version}")
 
-        # Push
-        subprocess.run(["git", "push"], check=True)
-        subprocess.run(["git", "push", "--tags"], check=True)
-        print(Fore.GREEN + f"✅ Git push completed (commit and tags sent to remote)")
+        # Push commit and tag in a single round-trip
+        subprocess.run(["git", "push", "--follow-tags"], check=True)
+        say(_OK, f"✅ Git push completed (commit and tags sent to remote)")
 
     except subprocess.CalledProcessError as e:
-        print(Fore.RED + f"⚠️ Git operation failed: {e}")
-        print(Fore.YELLOW + "You may need to manually resolve and push.")
+        say(_ERR, f"⚠️ Git operation failed: {e}")
+        say(_WARN, "You may need to manually resolve and push.")
 
 
 # -------------------------------
-# Main CLI logic (Using argparse)
+# Main CLI logic (argparse only for help and errors)
 # -------------------------------
 
-def parse_args():
-    """Parse command line arguments using argparse."""
+def parse_args(argv=None):
+    """Parse plain command line forms directly, deferring anything else to argparse."""
+    argv = sys.argv[1:] if argv is None else argv
+    positionals = []
+    category = "feature"
+    dry_run = False
+
+    # argparse only fills positionals from one contiguous run of arguments
+    positionals_closed = False
+    args = iter(argv)
+    for arg in args:
+        if arg in ("-d", "--dry-run"):
+            dry_run = True
+        elif arg in ("-c", "--category"):
+            category = next(args, None)
+            if category not in CHANGELOG_CATEGORIES:
+                return _parse_args_full(argv)
+        elif arg.startswith("-") and arg != "-":
+            return _parse_args_full(argv)
+        elif positionals_closed:
+            return _parse_args_full(argv)
+        else:
+            positionals.append(arg)
+            continue
+        positionals_closed = bool(positionals)
+
+    if len(positionals) == 1:
+        positionals.append("patch")
+    if len(positionals) != 2 or positionals[1] not in BUMP_TYPES:
+        return _parse_args_full(argv)
+
+    message, bump = positionals
+    return SimpleNamespace(message=message, bump=bump, category=category, dry_run=dry_run)
+
+
+def _parse_args_full(argv):
+    """Parse with argparse; prints usage and exits on help or invalid input."""
+    import argparse
+
     parser = argparse.ArgumentParser(
         description="Automated version management, changelog update, and Git release process.",
         formatter_class=argparse.RawTextHelpFormatter
@@ -213,7 +415,7 @@ def parse_args():
 
     parser.add_argument(
         "bump",
-        choices=["patch", "minor", "major"],
+        choices=BUMP_TYPES,
         nargs="?",
         default="patch",
         help="The segment of the version to increment (default: patch)."
@@ -232,38 +434,42 @@ def parse_args():
         help="Simulate the entire process without writing files or running git commands."
     )
 
-    return parser.parse_args()
+    return parser.parse_args(argv)
 
 
 def main():
+    from datetime import datetime
+
     args = parse_args()
-    
-    # 2. Check for uncommitted changes first
-    if not args.dry_run and not is_working_dir_clean():
-        print(Fore.RED + "❌ Working directory is not clean. Commit or stash changes before releasing.")
-        sys.exit(1)
-        
-    raw_message = args.message
-    # Remove surrounding quotes from the message
-    if raw_message.startswith(('"""', "'''")) and raw_message.endswith(('"""', "'''")):
-        message = raw_message.strip().strip('"').strip("'")
-    else:
-        message = raw_message.strip('"').strip("'")
-    
+    # parse_args already restricts --category; fall back rather than KeyError later
+    if args.category not in CHANGELOG_CATEGORIES:
+        args.category = "feature"
+
+    # Validate everything that needs no git or filesystem access first
+    message = _QUOTE_STRIP_RE.match(args.message).group("body")
     if not message.strip():
-        print(Fore.RED + "❌ Commit message cannot be empty.")
+        say(_ERR, "❌ Commit message cannot be empty.")
+        sys.exit(1)
+
+    # 2. Check for uncommitted changes before touching VERSION
+    if not args.dry_run and not is_working_dir_clean():
+        say(_ERR, "❌ Working directory is not clean. Commit or stash changes before releasing.")
         sys.exit(1)
 
+    # One date for the whole release, even if the run straddles midnight
+    release_date = datetime.now().strftime("%Y-%m-%d")
     current_version = get_current_version()
     new_version = bump_version(current_version, args.bump)
     
     # Update files returns the list of files to be added to git
-    files_to_add = update_files(new_version, message, args.category, dry_run=args.dry_run)
+    files_to_add = update_files(
+        current_version, new_version, message, args.category, release_date, dry_run=args.dry_run
+    )
     
     # Perform git operations
     git_commit_and_tag(new_version, message, files_to_add, dry_run=args.dry_run)
 
-    print(Style.BRIGHT + Fore.GREEN + f"\n🎉 Done! {'(Preview only)' if args.dry_run else ''} Released version v{new_version}\n")
+    say(_OK, f"\n🎉 Done! {'(Preview only)' if args.dry_run else ''} Released version v{new_version}\n", bright=True)
 
 
 if __name__ == "__main__":